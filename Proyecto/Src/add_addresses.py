@@ -5,6 +5,8 @@ Script para AÑADIR DIRECCIONES usando el motor del scraper principal.
 - Utiliza Selenium para cargar la página y la sesión.
 - Utiliza BeautifulSoup para analizar el HTML y extraer la dirección.
 - Guarda el progreso en un archivo CSV.
+- Usa la sesión liviana compartida (lean_session.py) para no descargar
+  imágenes, fuentes, estilos ni scripts de terceros.
 """
 
 import pandas as pd
@@ -15,27 +17,22 @@ import argparse
 from tqdm import tqdm
 import pickle
 
-from selenium import webdriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import WebDriverException, TimeoutException
 from bs4 import BeautifulSoup
 
+from lean_session import LeanSession, DEFAULT_BLOCKED_TYPES, block_types_arg, block_urls_arg, fmt_stats
+
 class AddressScraper:
-    def __init__(self, cookies_path: str, headless=True):
+    def __init__(self, cookies_path: str, headless=True, block_types=None, block_urls=None):
         self.cookies_path = cookies_path
-        opts = webdriver.ChromeOptions()
-        if headless:
-            opts.add_argument("--headless=new")
-        
-        opts.add_argument("--no-sandbox")
-        opts.add_argument("--disable-dev-shm-usage")
-        opts.add_argument('--disable-blink-features=AutomationControlled')
-        opts.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36")
-        
+        self.session = LeanSession(headless=headless, block_types=block_types, block_urls=block_urls)
+        self.driver = self.session.driver
+        self.last_stats = None
         try:
-            self.driver = webdriver.Chrome(options=opts)
             self.load_cookies()
         except WebDriverException as e:
+            self.session.close()
             raise SystemExit(f"no se pudo iniciar ChromeDriver: {e}")
 
     def load_cookies(self):
@@ -54,12 +51,13 @@ class AddressScraper:
         time.sleep(2)
 
     def get_address_from_url(self, url: str) -> str | None:
-      
+        self.last_stats = None
         try:
-            self.driver.get(url)
+            self.session.get(url)
             
             WebDriverWait(self.driver, 10).until(lambda d: d.execute_script('return document.readyState') == 'complete')
             time.sleep(1) 
+            self.last_stats = self.session.page_stats()
             
             # Pasa el HTML renderizado a beautifulsoup
             soup = BeautifulSoup(self.driver.page_source, 'html.parser')
@@ -95,14 +93,16 @@ class AddressScraper:
             return None
 
     def close(self):
-        try: self.driver.quit()
-        except Exception: pass
+        print(self.session.summary())
+        self.session.close()
 
 def main():
     ap = argparse.ArgumentParser(description="Añadir direcciones a un CSV (versión BeautifulSoup).")
     ap.add_argument("--input", default="Dataset_viviendas.csv", help="Ruta al CSV de entrada.")
     ap.add_argument("--output", default="Dataset_viviendas_con_direccion.csv", help="Ruta para guardar el nuevo CSV.")
     ap.add_argument("--cookies", default="ml_cookies.pkl", help="Ruta al archivo de cookies.")
+    ap.add_argument("--block-types", type=block_types_arg, default=None, help=f"Tipos de recurso a bloquear, separados por coma o 'none' (default: {','.join(DEFAULT_BLOCKED_TYPES)}).")
+    ap.add_argument("--block-urls", type=block_urls_arg, default=None, help="Patrones de URL a bloquear, separados por coma o 'none' (default: analytics y publicidad).")
     args = ap.parse_args()
 
     try:
@@ -124,7 +124,8 @@ def main():
         
         return
 
-    scraper = AddressScraper(cookies_path=args.cookies, headless=False)
+    scraper = AddressScraper(cookies_path=args.cookies, headless=False,
+                             block_types=args.block_types, block_urls=args.block_urls)
     try:
        
         with open(progreso_file, 'a', encoding='utf-8', newline='') as f_progreso:
@@ -135,7 +136,8 @@ def main():
             for url in tqdm(urls_a_procesar, desc="Extrayendo direcciones"):
                 direccion = scraper.get_address_from_url(url)
                 
-                print(f"-> URL: {url} | Dirección: {direccion}")
+                red = f" | {fmt_stats(scraper.last_stats)}" if scraper.last_stats else ""
+                print(f"-> URL: {url} | Dirección: {direccion}{red}")
                 
                 direcciones.append(direccion)
                 
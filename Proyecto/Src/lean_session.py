@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sesión liviana de Chrome compartida por los scrapers.
+
+- Navega siempre en una única pestaña reutilizada (sin window.open por aviso).
+- Bloquea en la capa de red (CDP Network.setBlockedURLs) tipos de recurso
+  pesados (imágenes, fuentes, hojas de estilo, media) y patrones de URL de
+  terceros (analytics, publicidad, iframes de anuncios).
+- Limita la memoria del renderer (heap de V8, un solo proceso renderer) y el
+  tamaño de la caché de disco.
+- Reporta los bytes recibidos por página (Network.loadingFinished del log de
+  performance de ChromeDriver, incluidos los recursos de terceros y las
+  peticiones que terminan después de medir) y la memoria propia (USS) de
+  Chrome (árbol de procesos de chromedriver, con psutil) para medir la
+  reducción de ancho de banda y memoria.
+- Si el renderer se cae (p. ej. OOM por el límite de heap), get() abre una
+  pestaña nueva, reaplica el bloqueo y reintenta una vez.
+"""
+
+import json
+import argparse
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, Iterable, List, Dict
+
+import psutil
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException, TimeoutException
+
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36"
+
+# Network.setBlockedURLs sólo acepta patrones de URL, así que cada tipo de
+# recurso se traduce a las extensiones que lo identifican.
+RESOURCE_TYPE_PATTERNS: Dict[str, List[str]] = {
+    "image": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.avif*"],
+    "font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "stylesheet": ["*.css*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.ogg*"],
+}
+
+DEFAULT_BLOCKED_TYPES = ["image", "font", "stylesheet", "media"]
+
+DEFAULT_BLOCKED_URLS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*googleadservices.com*", "*facebook.net*",
+    "*facebook.com/tr*", "*hotjar.com*", "*criteo.*", "*taboola.com*",
+    "*outbrain.com*", "*adnxs.com*", "*scorecardresearch.com*",
+    "*mercadoclics*", "*/ads/*", "*/adserver/*",
+]
+
+# Límites del renderer: heap de V8 en MB y caché de disco en bytes.
+DEFAULT_JS_HEAP_MB = 512
+DEFAULT_DISK_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def parse_list_arg(value: Optional[str], default: List[str]) -> List[str]:
+    """Convierte un argumento 'a,b,c' de la CLI en lista; 'none' la vacía."""
+    if value is None: return list(default)
+    value = value.strip()
+    if value.lower() in ("", "none"): return []
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def block_types_arg(value: str) -> List[str]:
+    """type= de argparse para --block-types: valida los tipos contra RESOURCE_TYPE_PATTERNS."""
+    types = parse_list_arg(value, DEFAULT_BLOCKED_TYPES)
+    bad = [t for t in types if t not in RESOURCE_TYPE_PATTERNS]
+    if bad:
+        raise argparse.ArgumentTypeError(f"tipo de recurso desconocido: {', '.join(bad)} (válidos: {', '.join(RESOURCE_TYPE_PATTERNS)}, o 'none')")
+    return types
+
+
+def block_urls_arg(value: str) -> List[str]:
+    """type= de argparse para --block-urls."""
+    return parse_list_arg(value, DEFAULT_BLOCKED_URLS)
+
+
+def blocked_patterns(block_types: Iterable[str], block_urls: Iterable[str]) -> List[str]:
+    patterns: List[str] = []
+    for t in block_types:
+        if t not in RESOURCE_TYPE_PATTERNS:
+            raise ValueError(f"Tipo de recurso desconocido: {t} (válidos: {', '.join(RESOURCE_TYPE_PATTERNS)})")
+        patterns.extend(RESOURCE_TYPE_PATTERNS[t])
+    patterns.extend(block_urls)
+    seen = set()
+    return [p for p in patterns if not (p in seen or seen.add(p))]
+
+
+@dataclass
+class PageStats:
+    url: str
+    bytes_transferred: int
+    requests: int
+    uss_bytes: Optional[int]
+
+
+class LeanSession:
+    def __init__(self, headless=True, block_types: Optional[Iterable[str]]=None,
+                 block_urls: Optional[Iterable[str]]=None, js_heap_mb=DEFAULT_JS_HEAP_MB,
+                 disk_cache_bytes=DEFAULT_DISK_CACHE_BYTES, extra_args: Iterable[str]=()):
+        self.block_types = list(DEFAULT_BLOCKED_TYPES if block_types is None else block_types)
+        self.block_urls = list(DEFAULT_BLOCKED_URLS if block_urls is None else block_urls)
+        self.patterns = blocked_patterns(self.block_types, self.block_urls)
+        self.stats: List[PageStats] = []
+        self._last: Optional[PageStats] = None
+
+        opts = Options()
+        if headless: opts.add_argument("--headless=new")
+        opts.add_argument("--no-sandbox")
+        opts.add_argument("--disable-dev-shm-usage")
+        opts.add_argument("--disable-blink-features=AutomationControlled")
+        opts.add_argument(f"user-agent={USER_AGENT}")
+        opts.add_argument("--renderer-process-limit=1")
+        opts.add_argument("--disable-extensions")
+        opts.add_argument("--disable-background-networking")
+        opts.add_argument("--disable-component-update")
+        opts.add_argument("--mute-audio")
+        opts.add_argument(f"--js-flags=--max-old-space-size={int(js_heap_mb)}")
+        opts.add_argument(f"--disk-cache-size={int(disk_cache_bytes)}")
+        opts.add_argument(f"--media-cache-size={int(disk_cache_bytes)}")
+        for a in extra_args: opts.add_argument(a)
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+        try: self.driver = webdriver.Chrome(options=opts)
+        except WebDriverException as e: raise SystemExit(f"No se pudo iniciar ChromeDriver: {e}")
+        self.driver.set_page_load_timeout(60)
+        self._enable_blocking()
+
+    def _enable_blocking(self):
+        d = self.driver
+        d.execute_cdp_cmd("Network.enable", {})
+        d.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.patterns})
+
+    @contextmanager
+    def unblocked(self):
+        """Suspende el bloqueo (p. ej. para el login manual, que necesita estilos, imágenes y captcha)."""
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+        try: yield
+        finally: self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.patterns})
+
+    def get(self, url: str):
+        """Navega en la pestaña actual, cerrando cualquier pestaña extra que haya quedado abierta."""
+        d = self.driver
+        handles = d.window_handles
+        if len(handles) > 1:
+            keep = handles[0]
+            for h in handles[1:]:
+                try: d.switch_to.window(h); d.close()
+                except Exception: pass
+            d.switch_to.window(keep)
+        self._flush_tail()
+        try:
+            d.get(url)
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            self._recover_tab()
+            d.get(url)
+
+    def _recover_tab(self):
+        """Reemplaza una pestaña caída ("tab crashed") por una nueva con el bloqueo reaplicado."""
+        d = self.driver
+        old = d.window_handles
+        d.switch_to.new_window("tab")
+        new = d.current_window_handle
+        for h in old:
+            try: d.switch_to.window(h); d.close()
+            except Exception: pass
+        d.switch_to.window(new)
+        self._enable_blocking()
+        self._drain_log()
+
+    def _flush_tail(self):
+        """Suma a la última página medida lo que terminó de cargar después de page_stats()."""
+        total, n = self._count_log(self._drain_log())
+        if self._last is not None:
+            self._last.bytes_transferred += total
+            self._last.requests += n
+        self._last = None
+
+    def _drain_log(self) -> list:
+        """Lee (y vacía) el log de performance acumulado desde la última llamada."""
+        try: return self.driver.get_log("performance")
+        except Exception: return []
+
+    def uss_bytes(self) -> Optional[int]:
+        """Memoria propia (USS) de chromedriver y sus procesos hijos; a diferencia del RSS no cuenta dos veces las páginas compartidas."""
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            procs = [root] + root.children(recursive=True)
+        except (psutil.Error, AttributeError):
+            return None
+        total = 0
+        for p in procs:
+            try: total += p.memory_full_info().uss
+            except psutil.Error: pass
+        return total
+
+    @staticmethod
+    def _count_log(entries: list):
+        total, n = 0, 0
+        for entry in entries:
+            try: msg = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError): continue
+            if msg.get("method") == "Network.loadingFinished":
+                total += int(msg.get("params", {}).get("encodedDataLength") or 0)
+                n += 1
+        return total, n
+
+    def page_stats(self) -> PageStats:
+        """Bytes recibidos desde la última navegación con get() y USS actual de Chrome.
+
+        Lo que termine de cargar después se suma a este PageStats en el próximo get().
+        """
+        total, n = self._count_log(self._drain_log())
+        st = PageStats(url=self.driver.current_url, bytes_transferred=total, requests=n, uss_bytes=self.uss_bytes())
+        self.stats.append(st)
+        self._last = st
+        return st
+
+    def summary(self) -> str:
+        self._flush_tail()
+        if not self.stats: return "[red] Sin páginas medidas"
+        total = sum(s.bytes_transferred for s in self.stats)
+        avg = total / len(self.stats)
+        uss = [s.uss_bytes for s in self.stats if s.uss_bytes is not None]
+        uss_txt = f", USS Chrome máx {max(uss)/1e6:.0f} MB" if uss else ""
+        return (f"[red] {len(self.stats)} páginas, {total/1e6:.2f} MB transferidos "
+                f"(promedio {avg/1e3:.0f} KB/página){uss_txt}")
+
+    def close(self):
+        try: self.driver.quit()
+        except Exception: pass
+
+
+def fmt_stats(st: PageStats) -> str:
+    uss = f", USS {st.uss_bytes/1e6:.0f} MB" if st.uss_bytes is not None else ""
+    return f"{st.bytes_transferred/1e3:.0f} KB en {st.requests} req{uss}"
@@ -11,6 +11,8 @@ PortalInmobiliario.com – Scraper de CASAS y DEPARTAMENTOS en venta por comuna
 - SIN webdriver_manager (usa Selenium Manager).
 - Lógica de parsing actualizada con BeautifulSoup para mayor robustez.
 - Versión flexible: m2_totales se copia de m2_construidos y dormitorios es opcional.
+- Sesión liviana (lean_session.py): una sola pestaña reutilizada, bloqueo de
+  recursos pesados/terceros y reporte de bytes transferidos por aviso.
 """
 
 import re
@@ -25,13 +27,13 @@ from typing import Optional, List, Dict
 import pandas as pd
 from bs4 import BeautifulSoup
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from lean_session import LeanSession, DEFAULT_BLOCKED_TYPES, block_types_arg, block_urls_arg, fmt_stats
+
 
 def parse_number_smart(text: Optional[str]):
     if not text: return None
@@ -128,26 +130,18 @@ class Casa:
 # ---------------------------- scraper ----------------------------
 
 class Scraper:
-    def __init__(self, headless=True, wait=20, cookies_path: Optional[str]=None, verbose=True):
+    def __init__(self, headless=True, wait=20, cookies_path: Optional[str]=None, verbose=True,
+                 block_types: Optional[List[str]]=None, block_urls: Optional[List[str]]=None):
         self.wait = wait
         self.cookies_path = cookies_path
         self.verbose = verbose
-        opts = Options()
-        if headless: opts.add_argument("--headless=new")
-        opts.add_argument("--window-size=1920,1080")
-        opts.add_argument("--disable-blink-features=AutomationControlled")
-        opts.add_argument("--no-sandbox")
-        opts.add_argument("--disable-dev-shm-usage")
-        opts.add_argument("--lang=es-CL")
-        opts.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36")
-        opts.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
-        try: self.driver = webdriver.Chrome(options=opts)
-        except WebDriverException as e: raise SystemExit(f"No se pudo iniciar ChromeDriver: {e}")
-        self.driver.set_page_load_timeout(60)
+        self.session = LeanSession(headless=headless, block_types=block_types, block_urls=block_urls,
+                                   extra_args=["--window-size=1920,1080", "--lang=es-CL"])
+        self.driver = self.session.driver
 
     def close(self):
-        try: self.driver.quit()
-        except Exception: pass
+        if self.verbose: print(self.session.summary())
+        self.session.close()
 
     def load_cookies(self, base_url: str):
         if not self.cookies_path or not os.path.exists(self.cookies_path): return
@@ -188,7 +182,9 @@ class Scraper:
             time.sleep(random.uniform(2, 3.5))
             if self._on_login_wall():
                 print("[LOGIN] Inicia sesión en la ventana y vuelve aquí. ENTER para continuar…")
-                input(); self.save_cookies(); self.driver.get(page_url); time.sleep(2)
+                with self.session.unblocked():
+                    self.driver.refresh()
+                    input(); self.save_cookies(); self.driver.get(page_url); time.sleep(2)
             for sel in ["button.cookies-banner__accept-button", "button[data-testid='action:understood-button']", ".cookie-consent-banner-opt-out__accept", "#newCookieDisclaimerButton"]:
                 try: WebDriverWait(self.driver, 4).until(EC.element_to_be_clickable((By.CSS_SELECTOR, sel))).click(); break
                 except Exception: pass
@@ -216,16 +212,17 @@ class Scraper:
     
     def parse_listing(self, url: str, comuna_tag: str) -> Optional[Casa]:
         d = self.driver
-        base = d.current_window_handle
-        d.execute_script("window.open(arguments[0], '_blank')", url)
+        try: self.session.get(url)
+        except WebDriverException: return None
         time.sleep(random.uniform(0.7, 1.5))
-        d.switch_to.window(d.window_handles[-1])
 
         try:
             WebDriverWait(d, self.wait).until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1")))
         except TimeoutException:
-            d.close(); d.switch_to.window(base); return None
+            return None
 
+        st = self.session.page_stats()
+        if self.verbose: print(f"[red] {fmt_stats(st)}")
         html = d.page_source
         soup = BeautifulSoup(html, "html.parser")
         
@@ -272,7 +269,7 @@ class Scraper:
 
        
         if any(v is None for v in [m2_construidos, banos]):
-            d.close(); d.switch_to.window(base); return None
+            return None
         
         
         if dormitorios is None:
@@ -294,7 +291,6 @@ class Scraper:
                     m2_construidos=m2_construidos, banos=banos, dormitorios=dormitorios, antiguedad_anos=antiguedad_anos, 
                     estacionamientos=estacionamientos, jardin=bool(jardin), piscina=bool(piscina),
                     quincho=bool(quincho), condominio_cerrado=bool(condominio_cerrado), educacion=educacion, comercios=comercios, salud=salud, url=url)
-        d.close(); d.switch_to.window(base)
         return casa
 
 
@@ -307,9 +303,12 @@ def main():
     ap.add_argument("--headless", action="store_true")
     ap.add_argument("--cookies", default=None)
     ap.add_argument("--quiet", action="store_true")
+    ap.add_argument("--block-types", type=block_types_arg, default=None, help=f"Tipos de recurso a bloquear, separados por coma o 'none' (default: {','.join(DEFAULT_BLOCKED_TYPES)})")
+    ap.add_argument("--block-urls", type=block_urls_arg, default=None, help="Patrones de URL a bloquear, separados por coma o 'none' (default: analytics y publicidad)")
     args = ap.parse_args()
 
-    scraper = Scraper(headless=args.headless, cookies_path=args.cookies, verbose=not args.quiet)
+    scraper = Scraper(headless=args.headless, cookies_path=args.cookies, verbose=not args.quiet,
+                      block_types=args.block_types, block_urls=args.block_urls)
     try:
         t0 = time.time()
         prev = None; seen_urls = set()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Superficie de tasación precalculada sobre una grilla lat/lon de la RM.
+
+- Evalúa el modelo entrenado (modelo_tasacion.pkl + scaler.pkl +
+  columnas_entrenamiento.pkl) sobre una grilla fina para cada tipo_vivienda
+  y cada perfil de propiedad de referencia (PERFILES).
+- La comuna de cada nodo se asigna por vecino más cercano con las
+  propiedades del dataset procesado (data_propiedades_loc.csv). Las grafías
+  de una misma comuna ("La Florida"/"La florida", "Maipu"/"Maipú") se
+  agrupan y el nodo usa la mezcla de sus dummies ponderada por frecuencia.
+- Los nodos a más de DIST_MAX_KM de la propiedad más cercana quedan sin dato
+  (NaN): tasar() devuelve None y los tiles web son transparentes ahí.
+- Guarda cada capa (tipo × perfil) como un .npy float32 de forma
+  (n_tiles_lat, n_tiles_lon, TILE+1, TILE+1): cada tile incluye el borde
+  del siguiente, así la interpolación bilineal nunca cruza tiles.
+- SuperficieTasacion abre las capas con memmap y responde en microsegundos.
+- Exporta tiles PNG (colores) y .bin (float32 crudo) para el sitio en docs/.
+- Regeneración incremental: cada tile guarda una huella del modelo y de sus
+  entradas (comunas, cobertura, perfil); sólo se recalculan los tiles cuya
+  huella cambió. Reentrenar el modelo recalcula todos los tiles; cambios del
+  dataset o de la grilla de comunas sólo los tiles afectados.
+"""
+
+import os
+import io
+import json
+import hashlib
+import argparse
+import time
+import unicodedata
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.neighbors import BallTree
+from matplotlib.image import imsave
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELO_DIR = os.path.join(BASE_DIR, "..", "Notebooks", "REGRESION")
+DATA_PATH = os.path.join(BASE_DIR, "..", "Data", "Procesados", "data_propiedades_loc.csv")
+SALIDA_DIR = os.path.join(BASE_DIR, "..", "Data", "Superficie")
+WEB_DIR = os.path.join(BASE_DIR, "..", "..", "docs", "superficie")
+
+CENTRO_LAT = -33.4395
+CENTRO_LON = -70.6347
+
+# Grilla (grados). Paso de 0.001° ≈ 110 m en latitud.
+LAT_MIN, LAT_MAX = -33.75, -33.15
+LON_MIN, LON_MAX = -70.90, -70.30
+PASO = 0.001
+TILE = 64
+# Distancia máxima (km) a la propiedad más cercana para considerar que un nodo tiene datos.
+DIST_MAX_KM = 2.0
+RADIO_TIERRA_KM = 6371
+
+TIPOS_VIVIENDA = ["casa", "departamento"]
+
+PERFILES: Dict[str, Dict[str, float]] = {
+    "pequena": {"m2_totales": 50, "m2_construidos": 45, "banos": 1, "dormitorios": 1,
+                "antiguedad_anos": 10, "estacionamientos": 0, "jardin": 0, "piscina": 0,
+                "quincho": 0, "condominio_cerrado": 1, "educacion": 1, "comercios": 1, "salud": 1},
+    "mediana": {"m2_totales": 120, "m2_construidos": 80, "banos": 2, "dormitorios": 3,
+                "antiguedad_anos": 20, "estacionamientos": 1, "jardin": 1, "piscina": 0,
+                "quincho": 0, "condominio_cerrado": 0, "educacion": 1, "comercios": 1, "salud": 1},
+    "grande": {"m2_totales": 300, "m2_construidos": 180, "banos": 3, "dormitorios": 4,
+               "antiguedad_anos": 15, "estacionamientos": 2, "jardin": 1, "piscina": 1,
+               "quincho": 1, "condominio_cerrado": 1, "educacion": 1, "comercios": 1, "salud": 1},
+}
+
+# Escala fija de colores (UF) para que un tile no cambie de color si no cambió su valor.
+ESCALA_UF = (1000.0, 25000.0)
+COLORMAP = "viridis"
+
+
+def calcular_distancia(lat1, lon1, lat2, lon2):
+    R = 6371
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = (np.sin(dlat/2) * np.sin(dlat/2) +
+         np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) *
+         np.sin(dlon/2) * np.sin(dlon/2))
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return R * c
+
+
+def nombre_capa(tipo_vivienda: str, perfil: str) -> str:
+    return f"{tipo_vivienda}__{perfil}"
+
+
+def normalizar_comuna(nombre: str) -> str:
+    """'Estación Central' y 'Estacion central' -> 'estacion central'."""
+    s = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode()
+    return " ".join(s.casefold().split())
+
+
+# ---------------------------- grilla ----------------------------
+
+class Grilla:
+    def __init__(self, lat_min=LAT_MIN, lat_max=LAT_MAX, lon_min=LON_MIN, lon_max=LON_MAX, paso=PASO, tile=TILE):
+        self.lat_min, self.lat_max = lat_min, lat_max
+        self.lon_min, self.lon_max = lon_min, lon_max
+        self.paso, self.tile = paso, tile
+        self.n_lat = int(round((lat_max - lat_min) / paso)) + 1
+        self.n_lon = int(round((lon_max - lon_min) / paso)) + 1
+        self.tiles_lat = -(-(self.n_lat - 1) // tile)
+        self.tiles_lon = -(-(self.n_lon - 1) // tile)
+
+    def to_dict(self) -> dict:
+        return {"lat_min": self.lat_min, "lat_max": self.lat_max, "lon_min": self.lon_min,
+                "lon_max": self.lon_max, "paso": self.paso, "tile": self.tile}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Grilla":
+        return cls(**d)
+
+    def forma_tile(self, ti: int, tj: int) -> Tuple[int, int]:
+        """Filas/columnas del tile que caen dentro de la grilla (menos de TILE+1 en el borde norte/este)."""
+        return (min(self.tile + 1, self.n_lat - ti*self.tile), min(self.tile + 1, self.n_lon - tj*self.tile))
+
+    def nodos_tile(self, ti: int, tj: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Lat/lon de los (TILE+1)² nodos del tile; fuera de la grilla se repite el borde (ver forma_tile)."""
+        idx_i = np.minimum(np.arange(ti*self.tile, ti*self.tile + self.tile + 1), self.n_lat - 1)
+        idx_j = np.minimum(np.arange(tj*self.tile, tj*self.tile + self.tile + 1), self.n_lon - 1)
+        lat = self.lat_min + idx_i * self.paso
+        lon = self.lon_min + idx_j * self.paso
+        return np.meshgrid(lat, lon, indexing="ij")
+
+    def limites_tile(self, ti: int, tj: int) -> List[List[float]]:
+        """[[sur, oeste], [norte, este]] de los nodos válidos del tile, medio paso hacia afuera (centro de pixel = nodo)."""
+        h = self.paso / 2
+        nr, nc = self.forma_tile(ti, tj)
+        lat0 = self.lat_min + ti*self.tile*self.paso
+        lon0 = self.lon_min + tj*self.tile*self.paso
+        return [[round(lat0 - h, 6), round(lon0 - h, 6)],
+                [round(lat0 + (nr-1)*self.paso + h, 6), round(lon0 + (nc-1)*self.paso + h, 6)]]
+
+
+# ---------------------------- modelo ----------------------------
+
+class ModeloTasacion:
+    def __init__(self, modelo_dir=MODELO_DIR, data_path=DATA_PATH):
+        self.model = joblib.load(os.path.join(modelo_dir, "modelo_tasacion.pkl"))
+        self.scaler = joblib.load(os.path.join(modelo_dir, "scaler.pkl"))
+        self.columnas: List[str] = list(joblib.load(os.path.join(modelo_dir, "columnas_entrenamiento.pkl")))
+        self.col_idx = {c: i for i, c in enumerate(self.columnas)}
+
+        df = pd.read_csv(data_path).dropna(subset=["latitud", "longitud", "comuna", "precio_uf"])
+        # mismo piso que predecir_precio: max(prediccion, Y.min())
+        self.precio_min = float(df["precio_uf"].min())
+
+        # Un grupo por comuna normalizada. Cada grupo activa sus dummies con el peso de cada
+        # grafía en el dataset, así el resultado no depende de qué aviso quedó más cerca.
+        conteo = df["comuna"].value_counts()
+        grupos: Dict[str, Dict[str, int]] = {}
+        for nombre, n in conteo.items(): grupos.setdefault(normalizar_comuna(nombre), {})[nombre] = int(n)
+        claves = sorted(grupos)
+        self.comunas = np.array([min(grupos[k], key=lambda g: (-grupos[k][g], g)) for k in claves])
+        self.mezcla = np.zeros((len(claves), len(self.columnas)), dtype=np.float64)
+        for gi, k in enumerate(claves):
+            total = sum(grupos[k].values())
+            for nombre, n in grupos[k].items():
+                col = self.col_idx.get(f"comuna_{nombre}")
+                if col is not None: self.mezcla[gi, col] += n / total
+
+        # descarta geocodificaciones fuera de la RM antes de asignar comunas
+        df = df[df["latitud"].between(LAT_MIN - 0.1, LAT_MAX + 0.1) & df["longitud"].between(LON_MIN - 0.1, LON_MAX + 0.1)]
+        self._comuna_de = np.searchsorted(claves, df["comuna"].map(normalizar_comuna).to_numpy())
+        self._arbol = BallTree(np.radians(df[["latitud", "longitud"]].to_numpy()), metric="haversine")
+
+    def huella_modelo(self) -> str:
+        return hashlib.sha1(pickle_bytes(self.model) + pickle_bytes(self.scaler)
+                            + json.dumps(self.columnas, ensure_ascii=False).encode()).hexdigest()
+
+    def asignar_comunas(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Índice en self.comunas de la propiedad más cercana a cada punto y su distancia en km."""
+        dist, idx = self._arbol.query(np.radians(np.column_stack([lat.ravel(), lon.ravel()])), k=1)
+        return self._comuna_de[idx[:, 0]].reshape(lat.shape), (dist[:, 0] * RADIO_TIERRA_KM).reshape(lat.shape)
+
+    def huella(self, huella_modelo: str, tipo_vivienda: str, perfil: str, comunas_idx: np.ndarray, sin_datos: np.ndarray) -> str:
+        """Hash de todo lo que determina el valor de un tile.
+
+        Incluye el modelo completo, así que reentrenar invalida todos los tiles;
+        un cambio del dataset (comunas asignadas, mezcla de grafías, cobertura)
+        sólo invalida los tiles donde se nota.
+        """
+        unicas, inversa = np.unique(comunas_idx, return_inverse=True)
+        h = hashlib.sha1()
+        h.update(json.dumps([huella_modelo, tipo_vivienda, PERFILES[perfil], self.precio_min,
+                             self.comunas[unicas].tolist()], sort_keys=True, ensure_ascii=False).encode())
+        h.update(self.mezcla[unicas].astype(np.float32).tobytes())
+        h.update(np.ascontiguousarray(inversa, dtype=np.int32).tobytes())
+        h.update(np.packbits(sin_datos).tobytes())
+        return h.hexdigest()
+
+    def predecir(self, tipo_vivienda: str, perfil: str, lat: np.ndarray, lon: np.ndarray, comunas_idx: np.ndarray) -> np.ndarray:
+        """Equivalente vectorizado de predecir_precio para muchos puntos con un mismo perfil."""
+        n = lat.size
+        X = np.zeros((n, len(self.columnas)), dtype=np.float64)
+        valores = dict(PERFILES[perfil])
+        valores["latitud"] = lat.ravel()
+        valores["longitud"] = lon.ravel()
+        valores["distancia_centro_km"] = calcular_distancia(lat.ravel(), lon.ravel(), CENTRO_LAT, CENTRO_LON)
+        for c, v in valores.items():
+            if c in self.col_idx: X[:, self.col_idx[c]] = v
+        tipo_col = self.col_idx.get(f"tipo_vivienda_{tipo_vivienda}")
+        if tipo_col is not None: X[:, tipo_col] = 1
+        X += self.mezcla[comunas_idx.ravel()]
+
+        X_scaled = self.scaler.transform(pd.DataFrame(X, columns=self.columnas))
+        pred = self.model.predict(X_scaled)
+        return np.maximum(pred, self.precio_min).reshape(lat.shape).astype(np.float32)
+
+
+def pickle_bytes(obj) -> bytes:
+    buf = io.BytesIO(); joblib.dump(obj, buf); return buf.getvalue()
+
+
+# ---------------------------- generación ----------------------------
+
+def _abrir_capa(path: str, grilla: Grilla, forzar: bool) -> Tuple[np.ndarray, bool]:
+    shape = (grilla.tiles_lat, grilla.tiles_lon, grilla.tile + 1, grilla.tile + 1)
+    if not forzar and os.path.exists(path):
+        arr = np.load(path, mmap_mode="r+")
+        if arr.shape == shape and arr.dtype == np.float32: return arr, False
+        del arr
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape), True
+
+
+def _exportar_tile_web(web_dir: str, capa: str, ti: int, tj: int, valores: np.ndarray):
+    """PNG y .bin con sólo los nodos válidos del tile; NaN (sin datos) queda transparente."""
+    carpeta = os.path.join(web_dir, capa)
+    os.makedirs(carpeta, exist_ok=True)
+    # .bin primero y .png al final: si la corrida se corta, el tile queda sin .png y se regenera.
+    valores.astype("<f4").tofile(os.path.join(carpeta, f"{ti}_{tj}.bin"))
+    # fila 0 de la grilla es el sur; en la imagen el norte va arriba.
+    imsave(os.path.join(carpeta, f"{ti}_{tj}.png"), np.flipud(valores),
+           cmap=COLORMAP, vmin=ESCALA_UF[0], vmax=ESCALA_UF[1], origin="upper")
+
+
+def generar_superficie(modelo: ModeloTasacion, salida_dir=SALIDA_DIR, web_dir: Optional[str]=WEB_DIR,
+                       grilla: Optional[Grilla]=None, tipos: Optional[List[str]]=None,
+                       perfiles: Optional[List[str]]=None, dist_max_km=DIST_MAX_KM,
+                       forzar=False, verbose=True) -> dict:
+    grilla = grilla or Grilla()
+    tipos = tipos or TIPOS_VIVIENDA
+    perfiles = perfiles or list(PERFILES)
+    os.makedirs(salida_dir, exist_ok=True)
+
+    manifest_path = os.path.join(salida_dir, "manifest.json")
+    previo = {}
+    if os.path.exists(manifest_path) and not forzar:
+        with open(manifest_path, encoding="utf-8") as f: previo = json.load(f)
+    if previo.get("grilla") != grilla.to_dict(): previo = {}
+    manifest = {"grilla": grilla.to_dict(), "escala_uf": list(ESCALA_UF), "dist_max_km": dist_max_km,
+                "perfiles": {p: PERFILES[p] for p in perfiles}, "capas": previo.get("capas", {})}
+
+    # La asignación de comunas y la cobertura no dependen del tipo ni del perfil.
+    comunas_tile = {}
+    for ti in range(grilla.tiles_lat):
+        for tj in range(grilla.tiles_lon):
+            lat, lon = grilla.nodos_tile(ti, tj)
+            com, dist = modelo.asignar_comunas(lat, lon)
+            sin_datos = dist > dist_max_km
+            nr, nc = grilla.forma_tile(ti, tj)
+            sin_datos[nr:, :] = True; sin_datos[:, nc:] = True
+            comunas_tile[ti, tj] = (lat, lon, com, sin_datos)
+
+    t0 = time.time(); recalculados = 0; total = 0
+    huella_modelo = modelo.huella_modelo()
+    for tipo in tipos:
+        for perfil in perfiles:
+            capa = nombre_capa(tipo, perfil)
+            arr, nueva = _abrir_capa(os.path.join(salida_dir, capa + ".npy"), grilla, forzar)
+            huellas_previas = {} if nueva else manifest["capas"].get(capa, {}).get("tiles", {})
+            huellas = {}
+            for (ti, tj), (lat, lon, com, sin_datos) in comunas_tile.items():
+                key = f"{ti}_{tj}"; total += 1
+                huellas[key] = modelo.huella(huella_modelo, tipo, perfil, com, sin_datos)
+                web_ok = not web_dir or all(os.path.exists(os.path.join(web_dir, capa, f"{key}.{ext}")) for ext in ("bin", "png"))
+                if huellas_previas.get(key) == huellas[key] and web_ok: continue
+                valores = modelo.predecir(tipo, perfil, lat, lon, com)
+                valores[sin_datos] = np.nan
+                arr[ti, tj] = valores
+                if web_dir:
+                    nr, nc = grilla.forma_tile(ti, tj)
+                    _exportar_tile_web(web_dir, capa, ti, tj, valores[:nr, :nc])
+                recalculados += 1
+            arr.flush(); del arr
+            manifest["capas"][capa] = {"tipo_vivienda": tipo, "perfil": perfil, "tiles": huellas}
+            if verbose: print(f"[superficie] {capa}: listo")
+
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, manifest_path)
+    if web_dir: _exportar_manifest_web(web_dir, grilla, manifest)
+    if verbose: print(f"[superficie] {recalculados}/{total} tiles recalculados en {time.time()-t0:.1f} s")
+    return manifest
+
+
+def _exportar_manifest_web(web_dir: str, grilla: Grilla, manifest: dict):
+    os.makedirs(web_dir, exist_ok=True)
+    # .bin: float32 little-endian, filas sur->norte, forma [filas, columnas]; NaN = sin datos.
+    web = {"grilla": grilla.to_dict(), "escala_uf": manifest["escala_uf"], "colormap": COLORMAP,
+           "dist_max_km": manifest["dist_max_km"], "perfiles": manifest["perfiles"],
+           "capas": {c: {"tipo_vivienda": v["tipo_vivienda"], "perfil": v["perfil"]} for c, v in manifest["capas"].items()},
+           "tiles": {f"{ti}_{tj}": {"limites": grilla.limites_tile(ti, tj), "forma": list(grilla.forma_tile(ti, tj))}
+                     for ti in range(grilla.tiles_lat) for tj in range(grilla.tiles_lon)}}
+    with open(os.path.join(web_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(web, f, ensure_ascii=False)
+
+
+# ---------------------------- consulta ----------------------------
+
+class SuperficieTasacion:
+    """Consulta de la superficie precalculada con interpolación bilineal."""
+
+    EPS = 1e-6  # tolerancia (en pasos) para puntos justo sobre el borde de la grilla
+
+    def __init__(self, salida_dir=SALIDA_DIR):
+        with open(os.path.join(salida_dir, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        g = self.grilla = Grilla.from_dict(self.manifest["grilla"])
+        self._lat_min, self._lon_min, self._inv_paso = g.lat_min, g.lon_min, 1.0 / g.paso
+        self._max_i, self._max_j, self._tile = g.n_lat - 2, g.n_lon - 2, g.tile
+        # ndarray sobre el buffer mapeado: indexar un np.memmap directamente es varias veces más lento
+        self._capas = {c: np.asarray(np.load(os.path.join(salida_dir, c + ".npy"), mmap_mode="r"))
+                       for c in self.manifest["capas"]}
+
+    def tasar(self, latitud: float, longitud: float, tipo_vivienda: str, perfil: str) -> Optional[float]:
+        """Valor en UF interpolado; None fuera de la grilla o donde no hay propiedades cercanas."""
+        arr = self._capas[nombre_capa(tipo_vivienda.lower(), perfil)]
+        fi = (latitud - self._lat_min) * self._inv_paso
+        fj = (longitud - self._lon_min) * self._inv_paso
+        if not (-self.EPS <= fi <= self._max_i + 1 + self.EPS and -self.EPS <= fj <= self._max_j + 1 + self.EPS): return None
+        i, j = min(max(int(fi), 0), self._max_i), min(max(int(fj), 0), self._max_j)
+        di, dj = min(max(fi - i, 0.0), 1.0), min(max(fj - j, 0.0), 1.0)
+        ti, r = divmod(i, self._tile)
+        tj, c = divmod(j, self._tile)
+        item = arr.item
+        v00, v01 = item(ti, tj, r, c), item(ti, tj, r, c+1)
+        v10, v11 = item(ti, tj, r+1, c), item(ti, tj, r+1, c+1)
+        if v00 != v00 or v01 != v01 or v10 != v10 or v11 != v11: return None  # NaN: sin datos
+        return (v00 * (1-di) * (1-dj) + v01 * (1-di) * dj +
+                v10 * di * (1-dj) + v11 * di * dj)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Superficie de tasación precalculada sobre una grilla lat/lon de la RM")
+    ap.add_argument("--modelo-dir", default=MODELO_DIR, help="Carpeta con modelo_tasacion.pkl, scaler.pkl y columnas_entrenamiento.pkl")
+    ap.add_argument("--data", default=DATA_PATH, help="CSV procesado con comuna, latitud y longitud")
+    ap.add_argument("--out", default=SALIDA_DIR, help="Carpeta de salida de las capas .npy")
+    ap.add_argument("--web-out", default=WEB_DIR, help="Carpeta de tiles para el sitio ('none' para no exportar)")
+    ap.add_argument("--paso", type=float, default=PASO, help="Paso de la grilla en grados")
+    ap.add_argument("--dist-max-km", type=float, default=DIST_MAX_KM, help="Distancia máxima a la propiedad más cercana para tasar un nodo")
+    ap.add_argument("--forzar", action="store_true", help="Recalcula todos los tiles aunque no hayan cambiado")
+    args = ap.parse_args()
+
+    modelo = ModeloTasacion(args.modelo_dir, args.data)
+    web_dir = None if args.web_out.lower() == "none" else args.web_out
+    generar_superficie(modelo, salida_dir=args.out, web_dir=web_dir, grilla=Grilla(paso=args.paso),
+                       dist_max_km=args.dist_max_km, forzar=args.forzar)
+
+if __name__ == "__main__":
+    main()